@@ -0,0 +1,54 @@
+"""
+Analysis Helpers
+
+Toy technical analysis behind the /api/analysis endpoint.
+Kept free of FastAPI and Pydantic and fully annotated, so the hot path can be
+profiled, benchmarked or compiled (e.g. with mypyc) on its own.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_SUMMARY_TEMPLATES: Dict[str, str] = {
+    "ar": "تحليل {sym}: مؤشر القوة النسبية {rsi:.1f}، متوسط متحرك 14 يوم {sma_14:.1f}. التوصية: {signal}.",
+    "en": "{sym} analysis: RSI {rsi:.1f}, 14-day SMA {sma_14:.1f}. Recommendation: {signal}.",
+}
+_SIGNAL_WORDS: Dict[str, Dict[str, str]] = {
+    "ar": {"buy": "شراء", "sell": "بيع", "hold": "احتفاظ"},
+    "en": {"buy": "buy", "sell": "sell", "hold": "hold"},
+}
+
+def toy_indicators(symbols: List[str]) -> Tuple[List[float], List[float], List[str]]:
+    """Compute the toy RSI, SMA and signal for a batch of symbols in one NumPy pass"""
+    lens = np.fromiter(map(len, symbols), dtype=np.int64, count=len(symbols))
+    joined = "".join(symbols)
+    # Tickers are ASCII, where each byte is ord(c); otherwise UTF-32 keeps one uint32 per code point
+    if joined.isascii():
+        codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+    else:
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    starts = np.zeros_like(lens)
+    np.cumsum(lens[:-1], out=starts[1:])
+    # reduceat cannot express empty segments, so empty symbols keep a sum of 0
+    sums = np.zeros(len(symbols), dtype=np.int64)
+    nonempty = lens > 0
+    if codes.size:
+        sums[nonempty] = np.add.reduceat(codes, starts[nonempty], dtype=np.int64)
+    rsi = (sums % 100) * 0.9
+    sma_14 = 50.0 + lens * 2
+    signals = np.where(rsi < 30, "buy", np.where(rsi > 70, "sell", "hold"))
+    return rsi.tolist(), sma_14.tolist(), signals.tolist()
+
+def analyze_symbols(symbols: List[str], language: str) -> List[Dict[str, object]]:
+    """Build AnalysisInsight-shaped dicts for each symbol"""
+    lang = "ar" if language == "ar" else "en"
+    template = _SUMMARY_TEMPLATES[lang]
+    words = _SIGNAL_WORDS[lang]
+    rsis, smas, signals = toy_indicators(symbols)
+
+    insights: List[Dict[str, object]] = []
+    for sym, rsi, sma_14, signal in zip(symbols, rsis, smas, signals):
+        summary = template.format(sym=sym, rsi=rsi, sma_14=sma_14, signal=words[signal])
+        insights.append({"symbol": sym, "rsi": rsi, "sma_14": sma_14, "signal": signal, "summary": summary})
+    return insights
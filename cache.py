@@ -0,0 +1,76 @@
+"""
+Cache Helper Functions
+
+Redis helper functions for caching hot read responses.
+Caching is optional: when REDIS_URL is not set every helper is a no-op,
+and Redis errors are swallowed so a cache outage never fails a request.
+"""
+
+import os
+from typing import Optional, List
+from dotenv import load_dotenv
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+# Load environment variables from .env file
+load_dotenv()
+
+redis = None
+
+redis_url = os.getenv("REDIS_URL")
+cache_ttl = int(os.getenv("CACHE_TTL_SECONDS", 30))
+# Short timeouts turn a stalled Redis into a RedisError, i.e. a cache miss
+cache_timeout = float(os.getenv("CACHE_TIMEOUT_SECONDS", 0.25))
+
+if redis_url:
+    redis = Redis.from_url(redis_url, socket_timeout=cache_timeout, socket_connect_timeout=cache_timeout)
+
+def list_key(collection_name: str, generation: int, limit: int, fields: Optional[List[str]] = None) -> str:
+    """Cache key for a list query on a collection at a given generation"""
+    if fields:
+        return f"{collection_name}:list:{generation}:{limit}:{','.join(fields)}"
+    return f"{collection_name}:list:{generation}:{limit}"
+
+def _generation_key(collection_name: str) -> str:
+    return f"{collection_name}:list:gen"
+
+async def list_generation(collection_name: str) -> Optional[int]:
+    """
+    Current list generation of a collection, or None when caching is unavailable.
+    Read it before querying MongoDB so a write racing the query bumps the
+    generation and the stale result is stored under a key nobody reads.
+    """
+    if redis is None:
+        return None
+    try:
+        return int(await redis.get(_generation_key(collection_name)) or 0)
+    except RedisError:
+        return None
+
+async def get_cached(key: str) -> Optional[bytes]:
+    """Return the cached value for key, or None on a miss"""
+    if redis is None:
+        return None
+    try:
+        return await redis.get(key)
+    except RedisError:
+        return None
+
+async def set_cached(key: str, value: bytes, ttl: int = cache_ttl):
+    """Store value under key for ttl seconds"""
+    if redis is None:
+        return
+    try:
+        await redis.setex(key, ttl, value)
+    except RedisError:
+        pass
+
+async def invalidate_lists(collection_name: str):
+    """Retire every cached list query for a collection by bumping its generation"""
+    if redis is None:
+        return
+    try:
+        # Old-generation entries are never read again and expire with their TTL
+        await redis.incr(_generation_key(collection_name))
+    except RedisError:
+        pass
@@ -5,12 +5,17 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, WriteError
 from datetime import datetime, timezone
+import asyncio
 import os
 from dotenv import load_dotenv
-from typing import Union
-from pydantic import BaseModel
+from typing import List, Optional, Tuple, Union, get_args
+from functools import lru_cache
+from pydantic import BaseModel, PlainSerializer, WrapSerializer
 
 # Load environment variables from .env file
 load_dotenv()
@@ -22,34 +27,199 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # Keep warm connections around between bursts instead of re-handshaking
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=50,
+        minPoolSize=10,
+        maxIdleTimeMS=60000,
+        socketTimeoutMS=5000,
+        serverSelectionTimeoutMS=2000,
+        retryWrites=True,
+    )
     db = _client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+DB_READY = db is not None
+
+# Single-document inserts are coalesced into unordered bulk writes.
+# While one batch is in flight the next one accumulates, so bursts are
+# amortized without adding latency to an idle server.
+WRITE_BATCH_SIZE = 500
+
+class _WriteBuffer:
+    """Per-collection queue of pending inserts flushed by a background task"""
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = None
+
+    def submit(self, doc: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.queue.put_nowait((doc, future))
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def close(self):
+        """Wait for queued inserts to be written, then stop the flusher"""
+        if self.task is None:
+            return
+        if not self.task.done():
+            await self.queue.join()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    async def _flush(self, batch: list):
+        failed = {}
+        try:
+            await db[self.collection_name].bulk_write(
+                [InsertOne(doc) for doc, _ in batch], ordered=False
+            )
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                failed[err["index"]] = WriteError(err.get("errmsg"), err.get("code"), err)
+        except Exception as e:
+            failed = {i: e for i in range(len(batch))}
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in failed:
+                future.set_exception(failed[i])
+            else:
+                future.set_result(None)
+
+# Queues and flusher tasks belong to the event loop that created them, so keep
+# one set of buffers per running loop (e.g. per uvicorn worker or test client)
+_write_buffers = {}
+
+def _write_buffer(collection_name: str) -> _WriteBuffer:
+    loop = asyncio.get_running_loop()
+    buffers = _write_buffers.get(loop)
+    if buffers is None:
+        # Forget buffers of loops that have since been closed
+        for stale in [l for l in _write_buffers if l.is_closed()]:
+            del _write_buffers[stale]
+        buffers = _write_buffers[loop] = {}
+    buffer = buffers.get(collection_name)
+    if buffer is None:
+        buffer = buffers[collection_name] = _WriteBuffer(collection_name)
+    return buffer
+
+async def close_write_buffers():
+    """Flush pending inserts and stop the running loop's flusher tasks (call on shutdown)"""
+    buffers = _write_buffers.pop(asyncio.get_running_loop(), {})
+    for buffer in buffers.values():
+        await buffer.close()
+
+def _contains_model(annotation) -> bool:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return True
+    return any(_contains_model(arg) for arg in get_args(annotation))
+
+def _has_custom_dump(model_cls: type) -> bool:
+    """True if model_dump() output can differ from the raw field values"""
+    decorators = model_cls.__pydantic_decorators__
+    if decorators.field_serializers or decorators.model_serializers or model_cls.model_computed_fields:
+        return True
+    for field in model_cls.model_fields.values():
+        if field.exclude or any(isinstance(m, (PlainSerializer, WrapSerializer)) for m in field.metadata):
+            return True
+    return False
+
+@lru_cache(maxsize=None)
+def _is_flat(model_cls: type) -> bool:
+    """
+    True if __dict__ already equals model_dump(): no field can hold a nested
+    Pydantic model and the model has no serializers, computed or excluded fields
+    """
+    if _has_custom_dump(model_cls):
+        return False
+    return not any(_contains_model(field.annotation) for field in model_cls.model_fields.values())
 
-    # Convert Pydantic model to dict if needed
+def _to_document(data: Union[BaseModel, dict]) -> dict:
+    """Convert a Pydantic model or dict into a timestamped document"""
+    # Convert Pydantic model to dict if needed. A validated flat model already
+    # holds BSON-ready values in __dict__, so only nested models need model_dump
     if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
+        data_dict = data.__dict__.copy() if _is_flat(type(data)) else data.model_dump()
     else:
         data_dict = data.copy()
 
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return data_dict
+
+# Helper functions for common database operations
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    data_dict = _to_document(data)
+
+    # Assign the id client-side so it is known before the batch is flushed
+    data_dict.setdefault('_id', ObjectId())
+
+    await _write_buffer(collection_name).submit(data_dict)
+    return str(data_dict['_id'])
+
+async def create_documents(collection_name: str, items: List[Union[BaseModel, dict]]) -> Tuple[List[Optional[str]], List[dict]]:
+    """
+    Insert many documents with timestamps in one unordered round-trip.
+    Returns the ids in input order (None where the insert failed) and the
+    write errors as {"index", "error"} dicts; unordered inserts are partial.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    if not items:
+        return [], []
+
+    docs = [_to_document(item) for item in items]
+    # Assign ids client-side so the successful ones are known even on partial failure
+    for doc in docs:
+        doc.setdefault('_id', ObjectId())
+
+    errors = []
+    try:
+        await db[collection_name].insert_many(docs, ordered=False, bypass_document_validation=True)
+    except BulkWriteError as e:
+        errors = [{"index": err["index"], "error": err.get("errmsg")} for err in e.details.get("writeErrors", [])]
+
+    failed = {err["index"] for err in errors}
+    ids = [None if i in failed else str(doc['_id']) for i, doc in enumerate(docs)]
+    return ids, errors
+
+async def ensure_indexes():
+    """Create indexes planned for upcoming per-user/per-symbol reads (no-op if they already exist)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    result = db[collection_name].insert_one(data_dict)
-    return str(result.inserted_id)
+    await db["order"].create_index([("user_id", 1), ("symbol", 1)])
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally projecting only some fields"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(None)
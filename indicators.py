@@ -0,0 +1,60 @@
+"""
+Technical Indicators
+
+Numba-compiled indicator kernels operating on NumPy price arrays.
+Kernels are compiled on first call (and cached to disk), so call warm_up()
+at startup to keep compilation out of the first real request.
+"""
+
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def rsi_sma(prices: np.ndarray, period: int = 14):
+    """
+    Wilder's RSI and the simple moving average over `period` closes.
+    Positions without enough history are NaN in both output arrays.
+    """
+    n = prices.shape[0]
+    rsi = np.full(n, np.nan)
+    sma = np.full(n, np.nan)
+
+    # Rolling-sum SMA
+    window = 0.0
+    for i in range(n):
+        window += prices[i]
+        if i >= period:
+            window -= prices[i - period]
+        if i >= period - 1:
+            sma[i] = window / period
+
+    if n <= period:
+        return rsi, sma
+
+    # Seed with the plain average of the first `period` changes...
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        change = prices[i] - prices[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= period
+    avg_loss /= period
+    rsi[period] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    # ...then apply Wilder's smoothing (an RMA with alpha = 1 / period)
+    for i in range(period + 1, n):
+        change = prices[i] - prices[i - 1]
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+        rsi[i] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    return rsi, sma
+
+def warm_up():
+    """Compile the kernels with a dummy series"""
+    rsi_sma(np.linspace(1.0, 2.0, 32), 14)
@@ -1,147 +1,219 @@
 import os
+import re
+import logging
+import orjson
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-from database import db, create_document, get_documents
+from database import db, DB_READY, create_document, create_documents, get_documents, ensure_indexes, close_write_buffers
+from indicators import warm_up as warm_up_indicators
+from analysis import analyze_symbols
+from cache import list_key, list_generation, get_cached, set_cached, invalidate_lists
 from schemas import User, Product, Portfolio, Order, Strategy, AnalysisRequest, AnalysisInsight
 
-app = FastAPI(title="KSA Trading API", description="Trading, mutual funds, and algo-trading backend for the Saudi market")
+logger = logging.getLogger("uvicorn.error")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Checked once here so endpoints don't have to guard every request
+    if not DB_READY:
+        raise RuntimeError("Database not configured. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        # Missing indexes only slow queries down, so don't refuse to start over them
+        logger.warning("Could not create indexes: %s", e)
+
+    # Sync endpoints run on AnyIO's worker threads; the default of 40 is easy to exhaust
+    to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("THREADPOOL_SIZE", 200))
+
+    # JIT-compile the indicator kernels now rather than on the first analysis request
+    warm_up_indicators()
+
+    yield
+
+    # Let coalesced inserts that are still queued reach MongoDB before exiting
+    await close_write_buffers()
+
+app = FastAPI(
+    title="KSA Trading API",
+    description="Trading, mutual funds, and algo-trading backend for the Saudi market",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# List responses are repetitive JSON and compress well; tiny bodies aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# Comma-separated list of allowed origins, e.g. "https://app.example.com,https://admin.example.com"
+ALLOWED_ORIGINS = tuple(o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip())
+
+# Added last so it is the outermost middleware and answers preflights first
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "POST"),
+    allow_headers=("Content-Type", "Authorization"),
 )
 
+# Constant for the lifetime of the process, so serialize once
+_ROOT_BODY = orjson.dumps({"message": "KSA Trading Backend Running"})
+
 @app.get("/")
-def read_root():
-    return {"message": "KSA Trading Backend Running"}
+async def read_root():
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 # --- Health & Schema ---
+# Everything except the live collection check is fixed once the process starts
+_TEST_STATIC = {
+    "backend": "✅ Running",
+    "database_url": "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set",
+    "database_name": "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set",
+    "connection_status": "Connected" if db is not None else "Not Connected",
+    "collections": [],
+}
+
 @app.get("/test")
-def test_database():
+async def test_database():
     """Test endpoint to check if database is available and accessible"""
-    response = {
-        "backend": "✅ Running",
-        "database": "❌ Not Available",
-        "database_url": None,
-        "database_name": None,
-        "connection_status": "Not Connected",
-        "collections": []
-    }
-
+    response = dict(_TEST_STATIC)
     try:
-        if db is not None:
-            response["database"] = "✅ Available"
-            response["database_url"] = "✅ Configured"
-            response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
-            response["connection_status"] = "Connected"
-            try:
-                collections = db.list_collection_names()
-                response["collections"] = collections[:10]
-                response["database"] = "✅ Connected & Working"
-            except Exception as e:
-                response["database"] = f"⚠️  Connected but Error: {str(e)[:50]}"
-        else:
-            response["database"] = "⚠️  Available but not initialized"
+        collections = await db.list_collection_names()
+        response["collections"] = collections[:10]
+        response["database"] = "✅ Connected & Working"
     except Exception as e:
-        response["database"] = f"❌ Error: {str(e)[:50]}"
-
-    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+        response["database"] = f"⚠️  Connected but Error: {str(e)[:50]}"
     return response
 
+# Schemas are static for the lifetime of the process, so build them once
+_SCHEMA_CACHE = {
+    "user": User.model_json_schema(),
+    "product": Product.model_json_schema(),
+    "portfolio": Portfolio.model_json_schema(),
+    "order": Order.model_json_schema(),
+    "strategy": Strategy.model_json_schema(),
+    "analysisrequest": AnalysisRequest.model_json_schema(),
+    "analysisinsight": AnalysisInsight.model_json_schema(),
+}
+_SCHEMA_BODY = orjson.dumps(_SCHEMA_CACHE)
+
 @app.get("/schema")
-def get_schema():
+async def get_schema():
     """Return schemas so the DB viewer can introspect collections"""
-    return {
-        "user": User.model_json_schema(),
-        "product": Product.model_json_schema(),
-        "portfolio": Portfolio.model_json_schema(),
-        "order": Order.model_json_schema(),
-        "strategy": Strategy.model_json_schema(),
-        "analysisrequest": AnalysisRequest.model_json_schema(),
-        "analysisinsight": AnalysisInsight.model_json_schema(),
-    }
+    return Response(content=_SCHEMA_BODY, media_type="application/json")
+
+_EMPTY_LIST_BODY = b"[]"
+
+# Plain (optionally dotted) field names only, so no $-operators reach the projection
+_FIELD_NAME = re.compile(r"[A-Za-z_]\w*(\.[A-Za-z_]\w*)*")
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Turn a comma-separated ?fields= value into a sorted, de-duplicated list"""
+    if not fields:
+        return None
+    names = {f.strip() for f in fields.split(",") if f.strip()}
+    for name in names:
+        if not _FIELD_NAME.fullmatch(name):
+            raise HTTPException(status_code=400, detail=f"Invalid field name: {name}")
+        # MongoDB rejects projecting both a path and one of its parents
+        parts = name.split(".")
+        for i in range(1, len(parts)):
+            if ".".join(parts[:i]) in names:
+                raise HTTPException(status_code=400, detail=f"Field {name} overlaps with {'.'.join(parts[:i])}")
+    return sorted(names) or None
+
+async def _list_collection(collection_name: str, limit: int, fields: Optional[str] = None) -> Response:
+    """Serve a list query from the cache, falling back to MongoDB on a miss"""
+    field_list = _parse_fields(fields)
+    generation = await list_generation(collection_name)
+    key = None if generation is None else list_key(collection_name, generation, limit, field_list)
+    if key is not None:
+        cached = await get_cached(key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    projection = {f: 1 for f in field_list} if field_list else None
+    docs = await get_documents(collection_name, {}, limit, projection)
+    if not docs:
+        body = _EMPTY_LIST_BODY
+    else:
+        # orjson only calls default for types it can't encode natively, i.e. ObjectId
+        body = orjson.dumps(docs, default=str)
+    if key is not None:
+        await set_cached(key, body)
+    return Response(content=body, media_type="application/json")
 
 # --- Portfolio Endpoints ---
 @app.post("/api/portfolio", response_model=dict)
-def create_portfolio(payload: Portfolio):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    inserted_id = create_document("portfolio", payload)
+async def create_portfolio(payload: Portfolio):
+    inserted_id = await create_document("portfolio", payload)
+    await invalidate_lists("portfolio")
     return {"id": inserted_id}
 
-@app.get("/api/portfolio", response_model=List[Dict[str, Any]])
-def list_portfolios(limit: int = 20):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    docs = get_documents("portfolio", {}, limit)
-    # Convert ObjectId to string if present
-    for d in docs:
-        if "_id" in d:
-            d["_id"] = str(d["_id"])
-    return docs
+@app.get("/api/portfolio", responses={200: {"model": List[Dict[str, Any]]}})
+async def list_portfolios(limit: int = 20, fields: Optional[str] = None):
+    return await _list_collection("portfolio", limit, fields)
 
 # --- Orders ---
 @app.post("/api/orders", response_model=dict)
-def place_order(order: Order):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    order_id = create_document("order", order)
+async def place_order(order: Order):
+    order_id = await create_document("order", order)
+    await invalidate_lists("order")
     return {"id": order_id, "status": "received"}
 
-@app.get("/api/orders", response_model=List[Dict[str, Any]])
-def list_orders(limit: int = 50):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    docs = get_documents("order", {}, limit)
-    for d in docs:
-        if "_id" in d:
-            d["_id"] = str(d["_id"])
-    return docs
+@app.post("/api/orders/batch", response_model=dict)
+async def place_orders(orders: List[Order]):
+    try:
+        order_ids, failed = await create_documents("order", orders)
+    finally:
+        # Unordered inserts may be partially written even when the call raises
+        await invalidate_lists("order")
+    return {
+        "ids": [oid for oid in order_ids if oid is not None],
+        "inserted": [i for i, oid in enumerate(order_ids) if oid is not None],
+        "failed": failed,
+        "status": "partial" if failed else "received",
+    }
+
+@app.get("/api/orders", responses={200: {"model": List[Dict[str, Any]]}})
+async def list_orders(limit: int = 50, fields: Optional[str] = None):
+    return await _list_collection("order", limit, fields)
 
 # --- Strategies ---
 @app.post("/api/strategies", response_model=dict)
-def create_strategy(strategy: Strategy):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    sid = create_document("strategy", strategy)
+async def create_strategy(strategy: Strategy):
+    sid = await create_document("strategy", strategy)
+    await invalidate_lists("strategy")
     return {"id": sid}
 
-@app.get("/api/strategies", response_model=List[Dict[str, Any]])
-def list_strategies(limit: int = 50):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    docs = get_documents("strategy", {}, limit)
-    for d in docs:
-        if "_id" in d:
-            d["_id"] = str(d["_id"])
-    return docs
+@app.get("/api/strategies", responses={200: {"model": List[Dict[str, Any]]}})
+async def list_strategies(limit: int = 50, fields: Optional[str] = None):
+    return await _list_collection("strategy", limit, fields)
 
 # --- AI Analysis (mocked analytics) ---
 # In real usage, you'd integrate with market data & an ML model.
-@app.post("/api/analysis", response_model=List[AnalysisInsight])
+@app.post("/api/analysis", responses={200: {"model": List[AnalysisInsight]}})
 def analyze(request: AnalysisRequest):
     # Simple, deterministic pseudo-analysis for demo
-    insights: List[AnalysisInsight] = []
-    for sym in request.symbols:
-        # toy calculations
-        rsi = (sum(ord(c) for c in sym) % 100) * 0.9
-        sma_14 = 50 + (len(sym) * 2)
-        signal = "buy" if rsi < 30 else ("sell" if rsi > 70 else "hold")
-        if request.language == "ar":
-            summary = f"تحليل {sym}: مؤشر القوة النسبية {rsi:.1f}، متوسط متحرك 14 يوم {sma_14:.1f}. التوصية: { 'شراء' if signal=='buy' else ('بيع' if signal=='sell' else 'احتفاظ') }."
-        else:
-            summary = f"{sym} analysis: RSI {rsi:.1f}, 14-day SMA {sma_14:.1f}. Recommendation: {signal}."
-        insights.append(AnalysisInsight(symbol=sym, rsi=rsi, sma_14=sma_14, signal=signal, summary=summary))
-    return insights
+    return ORJSONResponse(analyze_symbols(request.symbols, request.language))
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Multiple workers require an import string rather than the app object
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        log_level="warning",
+    )